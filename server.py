@@ -1,193 +1,1008 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import asyncio
 import json
+import mmap
 import os
-import re
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import Any, Optional
-from urllib.parse import urlparse, parse_qs
+import signal
+import sys
+import time
+from contextlib import asynccontextmanager, contextmanager, suppress
+from dataclasses import dataclass
+from email.utils import formatdate
+from functools import lru_cache
+from http import HTTPStatus
+from itertools import islice
+from operator import attrgetter
+from typing import Any, AsyncIterator, BinaryIO, Iterable, Iterator, Optional, Sequence, Union
+from urllib.parse import unquote_plus, urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 TASKS_FILENAME = 'tasks.txt'
-ALLOWED_PRIORITIES = {"low", "normal", "high"}
+TASKS_LOG_FILENAME = 'tasks.log'
+LOG_COMPACTION_RATIO = 4
+LOG_COMPACTION_MIN_BYTES = 64 * 1024
+RESPONSE_CACHE_SIZE = 64
+STREAM_THRESHOLD = 1000
+STREAM_BATCH_SIZE = 256
+SENDFILE_MIN_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 5.0
+MAX_REQUEST_HEAD_SIZE = 64 * 1024
+GROUP_COMMIT_MAX_RECORDS = 64
+FILE_LOCK_RETRY_DELAY = 0.001
+PRIORITY_NAMES = ("low", "normal", "high")
+PRIORITY_IDS = {name: priority_id for priority_id, name in enumerate(PRIORITY_NAMES)}
+
+_STATUS_LINES = {status.value: f"HTTP/1.1 {status.value} {status.phrase}\r\n".encode("latin-1") for status in HTTPStatus}
+_CONNECTION_HEADERS = {False: b"Connection: keep-alive\r\n", True: b"Connection: close\r\n"}
+_JSON_HEADERS = b"Content-Type: application/json; charset=utf-8\r\nContent-Length: %d\r\n"
+_JSON_STREAM_HEADERS = b"Content-Type: application/json; charset=utf-8\r\nTransfer-Encoding: chunked\r\n"
+_EMPTY_HEADERS = b"Content-Length: 0\r\n"
+_date_second = 0
+_date_header = b""
+_log_second = 0
+_log_timestamp = b""
+
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(payload: Any) -> bytes:
+
+        return json.dumps(payload, ensure_ascii=False, default=_task_to_dict).encode("utf-8")
+
+    def _json_loads(data: Union[bytes, bytearray, memoryview]) -> Any:
+
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+def _split_target(target: str) -> tuple[str, str]:
+
+    path, _, query_string = target.partition("?")
+    if path.startswith("/") and not path.startswith("//") and ";" not in path and "#" not in target:
+        return path, query_string
+    # Absolute-form targets, fragments and ;params are rare; leave them to
+    # urlparse() so they route as they always have.
+    parts = urlparse(target)
+    return parts.path, parts.query
+
+
+def _parse_complete_path(path: str) -> Optional[int]:
+
+    if path.startswith("/tasks/") and path.endswith("/complete"):
+        task_id = path[7:-9]
+        if task_id.isdecimal():
+            return int(task_id)
+    return None
+
+
+def _parse_query(query_string: str) -> dict[str, str]:
+
+    query: dict[str, str] = {}
+    for pair in query_string.split("&"):
+        name, _, value = pair.partition("=")
+        if value and name not in query:
+            if "%" in value or "+" in value:
+                value = unquote_plus(value)
+            query[name] = value
+    return query
+
+
+def _get_date_header() -> bytes:
+
+    global _date_second, _date_header
+    now = int(time.time())
+    if now != _date_second:
+        _date_second = now
+        _date_header = f"Date: {formatdate(now, usegmt=True)}\r\n".encode("latin-1")
+    return _date_header
 
 
 def log(message: str) -> None:
 
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{ts}] {message}", flush=True)
+    global _log_second, _log_timestamp
+    now = int(time.time())
+    if now != _log_second:
+        _log_second = now
+        _log_timestamp = time.strftime("[%Y-%m-%d %H:%M:%S] ", time.localtime(now)).encode()
+    out = sys.stdout.buffer
+    out.write(_log_timestamp + message.encode() + b"\n")
+    out.flush()
+
+
+_TASK_FIELDS = ("title", "priority", "isDone", "id")
 
 
 @dataclass
 class Task:
 
+    # Declared by hand: dataclass(slots=True) needs Python 3.10.
+    __slots__ = _TASK_FIELDS
+
     title: str
     priority: str
     isDone: bool
     id: int
 
+
+_task_values = attrgetter(*_TASK_FIELDS)
+
+
+def _task_to_dict(task: Task) -> dict[str, Any]:
+
+    return dict(zip(_TASK_FIELDS, _task_values(task)))
+
+
+def _task_from_json(item: Any) -> Optional[Task]:
+
+    if not isinstance(item, dict):
+        return None
+
+    title = item.get("title")
+    priority = item.get("priority")
+    is_done = item.get("isDone")
+    task_id = item.get("id")
+
+    if (
+        isinstance(title, str)
+        and isinstance(priority, str)
+        and priority in PRIORITY_IDS
+        and isinstance(is_done, bool)
+        and isinstance(task_id, int)
+        and task_id > 0
+    ):
+        return Task(title=title, priority=priority, isDone=is_done, id=task_id)
+    return None
+
+
 class TaskStorage:
 
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, log_filename: str, *, durable: bool = False, shared: bool = False):
 
         self._filename = filename
-        self._tasks_by_id: dict[int, Task] = {}
+        self._log_filename = log_filename
+        self._durable = durable
+        self.shared = shared
+        self._ids: list[int] = []
+        self._titles: list[str] = []
+        self._priorities = bytearray()
+        self._is_done = bytearray()
+        self._index_by_id: dict[int, int] = {}
+        self._by_priority: list[list[int]] = []
+        self._by_done: dict[bool, set[int]] = {}
         self._next_task_id = 1
-        self._load_from_file()
-
-    def list_tasks(self, *, is_done: Optional[bool] = None, priority: Optional[str] = None) -> list[Task]:
+        self._serialized: Optional[bytearray] = None
+        self._full_list_file: Optional[BinaryIO] = None
+        self._full_list_file_stale = True
+        self._unfinished_offsets: dict[int, int] = {}
+        self._unpatched_completions: set[int] = set()
+        self._snapshot_size = 0
+        self._log: Optional[BinaryIO] = None
+        self._log_ino = 0
+        self._log_size = 0
+        self._compaction_retry_size = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._commit_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._lock_file: Optional[BinaryIO] = None
+        self._list_tasks_json_cached = lru_cache(maxsize=RESPONSE_CACHE_SIZE)(self._list_tasks_json)
+
+        # The log and its lock file are only created by the first write, so a
+        # storage that is merely read leaves nothing behind.
+        if os.path.exists(log_filename):
+            with self._file_lock(exclusive=True):
+                self._reload()
+                self._drop_torn_record()
+        else:
+            self._reload()
+
+    def reopen(self) -> None:
+
+        # flock() locks and file offsets belong to the open file description,
+        # which a forked worker shares with its parent, so each process needs
+        # its own handles.
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        with self._file_lock(exclusive=False):
+            self._reload()
+
+    def close(self) -> None:
+
+        for f in (self._log, self._lock_file, self._full_list_file):
+            if f is not None:
+                f.close()
+        self._log = self._lock_file = self._full_list_file = None
+        self._full_list_file_stale = True
+
+    async def refresh(self) -> None:
+
+        # Catch up with other workers' writes. Reads do not do this on their
+        # own, so a request refreshes once and then reads as often as it needs.
+        # While this process holds the write lock its own record may be
+        # half-applied; the writer catches up with other workers itself.
+        # Unless the files are shared, there is nobody to catch up with.
+        if not self.shared:
+            return
+        lock = self._get_lock()
+        if lock.locked():
+            return
 
-        tasks = list(self._tasks_by_id.values())
-        tasks.sort(key=lambda t: t.id)
+        if self._log_replaced():
+            # The local lock keeps this process's own flock() calls, which all
+            # share one file description, from upgrading or releasing each other.
+            async with lock, self._async_file_lock(exclusive=False):
+                if self._log_replaced():
+                    self._reload()
+        elif self._log is not None and os.fstat(self._log.fileno()).st_size > self._log_size:
+            self._replay_log()
+
+    def list_tasks(
+        self,
+        *,
+        is_done: Optional[bool] = None,
+        priority: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> list[Task]:
+
+        return [self._task_at(i) for i in self._page_indexes(is_done, priority, offset, limit)]
+
+    def iter_task_batches(
+        self,
+        *,
+        is_done: Optional[bool] = None,
+        priority: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[list[Task]]:
+
+        # Only the ids of the page are taken up front; tasks are built one
+        # batch at a time, looked up by id in case the listing changes between
+        # batches.
+        ids = [self._ids[i] for i in self._page_indexes(is_done, priority, offset, limit)]
+        for start in range(0, len(ids), batch_size):
+            indexes = map(self._index_by_id.get, ids[start:start + batch_size])
+            yield [self._task_at(i) for i in indexes if i is not None]
+
+    def _page_indexes(
+        self, is_done: Optional[bool], priority: Optional[str], offset: int, limit: Optional[int]
+    ) -> Sequence[int]:
+
+        priority_id = None if priority is None else PRIORITY_IDS[priority]
+        indexes: Iterable[int] = range(len(self._ids)) if priority_id is None else self._by_priority[priority_id]
 
         if is_done is not None:
-            tasks = [t for t in tasks if t.isDone == is_done]
+            done_indexes = self._by_done[is_done]
+            if len(done_indexes) < len(indexes):
+                indexes = sorted(done_indexes)
+                if priority_id is not None:
+                    indexes = (i for i in indexes if self._priorities[i] == priority_id)
+            else:
+                indexes = (i for i in indexes if i in done_indexes)
+
+        stop = None if limit is None else offset + limit
+        if isinstance(indexes, (list, range)):
+            return indexes[offset:stop]
+        # islice() rejects bounds past sys.maxsize; no listing gets that long.
+        return list(islice(indexes, min(offset, sys.maxsize), None if stop is None else min(stop, sys.maxsize)))
+
+    def list_tasks_json(
+        self,
+        *,
+        is_done: Optional[bool] = None,
+        priority: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[bytes]:
+
+        return self._list_tasks_json_cached(is_done, priority, offset, limit)
+
+    def _list_tasks_json(
+        self, is_done: Optional[bool], priority: Optional[str], offset: int, limit: Optional[int]
+    ) -> Optional[bytes]:
+
+        if is_done is None and priority is None and offset == 0 and limit is None:
+            return bytes(self._full_list_json())
+
+        indexes = self._page_indexes(is_done, priority, offset, limit)
+        if len(indexes) > STREAM_THRESHOLD:
+            return None
+        return _json_dumps([self._task_at(i) for i in indexes])
+
+    def full_list_file(self) -> Optional[BinaryIO]:
 
-        if priority is not None:
-            tasks = [t for t in tasks if t.priority == priority]
+        # Large unfiltered listings are also kept in a memfd so they can be
+        # sent with sendfile(). Each version gets a new memfd rather than being
+        # rewritten in place, since earlier responses may still be sending the
+        # old one; it is closed once the last of them drops its reference.
+        # A listing too small for sendfile() is remembered as None, so the
+        # check is not repeated until the tasks change.
+        if self._full_list_file_stale:
+            self._full_list_file = self._write_full_list_file()
+            self._full_list_file_stale = False
+        return self._full_list_file
 
-        return tasks
+    def _write_full_list_file(self) -> Optional[BinaryIO]:
 
-    def create_task(self, title: str, priority: str) -> Task:
+        if not hasattr(os, "memfd_create"):
+            return None
+        data = self._full_list_json()
+        if len(data) < SENDFILE_MIN_BYTES:
+            return None
+        try:
+            f = open(os.memfd_create("tasks", os.MFD_CLOEXEC), "w+b")
+        except OSError:
+            return None
+        f.write(data)
+        f.flush()
+        return f
 
-        task = Task(title=title, priority=priority, isDone=False, id=self._next_task_id)
-        self._tasks_by_id[task.id] = task
-        self._next_task_id += 1
-        self._save_to_file_atomic()
-        return task
+    async def create_task(self, title: str, priority: str) -> Task:
 
-    def mark_task_completed(self, task_id: int) -> bool:
+        return await self._submit({"op": "create", "title": title, "priority": priority, "isDone": False})
 
-        task = self._tasks_by_id.get(task_id)
-        if task is None:
-            return False
-        task.isDone = True
-        self._save_to_file_atomic()
-        return True
+    async def mark_task_completed(self, task_id: int) -> bool:
+
+        return await self._submit({"op": "complete", "id": task_id})
+
+    async def compact(self) -> None:
+
+        # Only encoding the snapshot and swapping the files in happen under the
+        # write lock. The snapshot is written to disk in between, while other
+        # workers keep appending; their records are carried over to the new log.
+        async with self._write_lock():
+            data = _json_dumps(self.list_tasks())
+            log_ino = self._log_ino
+            log_size = self._log_size
+
+        tmp_name = f"{self._filename}.{os.getpid()}.tmp"
+        log_tmp_name = f"{self._log_filename}.{os.getpid()}.tmp"
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_file, tmp_name, data)
+
+            async with self._write_lock():
+                if self._log_ino != log_ino:
+                    # Another worker compacted in the meantime.
+                    return
+
+                # Swap in a fresh log instead of truncating in place so that other
+                # workers notice the new inode and reload from the new snapshot.
+                self._log.seek(log_size)
+                tail = self._log.read(self._log_size - log_size)
+                self._write_file(log_tmp_name, tail)
+                os.replace(tmp_name, self._filename)
+                os.replace(log_tmp_name, self._log_filename)
+                self._snapshot_size = len(data)
+                self._open_log(create=True)
+                self._log_size = len(tail)
+        finally:
+            for name in (tmp_name, log_tmp_name):
+                with suppress(FileNotFoundError):
+                    os.remove(name)
+
+    @contextmanager
+    def _file_lock(self, *, exclusive: bool) -> Iterator[None]:
+
+        if fcntl is None:
+            yield
+            return
+
+        fd = self._lock_fileno()
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @asynccontextmanager
+    async def _async_file_lock(self, *, exclusive: bool) -> AsyncIterator[None]:
+
+        if fcntl is None:
+            yield
+            return
+
+        # A blocking flock() would stall this worker's event loop for as long
+        # as another worker holds the lock, so poll for it instead.
+        fd = self._lock_fileno()
+        operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+        while True:
+            try:
+                fcntl.flock(fd, operation)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(FILE_LOCK_RETRY_DELAY)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _lock_fileno(self) -> int:
+
+        if self._lock_file is None:
+            self._lock_file = open(f"{self._log_filename}.lock", "ab")
+        return self._lock_file.fileno()
+
+    @asynccontextmanager
+    async def _write_lock(self) -> AsyncIterator[None]:
+
+        async with self._get_lock(), self._async_file_lock(exclusive=True):
+            if self._log_replaced():
+                self._reload()
+            else:
+                self._replay_log()
+            if self._log is None:
+                self._open_log(create=True)
+            self._drop_torn_record()
+            yield
+
+    def _get_lock(self) -> asyncio.Lock:
+
+        # Like the commit queue, the lock must be created inside the running
+        # loop; before Python 3.10 it binds to the current loop at creation.
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _log_replaced(self) -> bool:
+
+        try:
+            return os.stat(self._log_filename).st_ino != self._log_ino
+        except FileNotFoundError:
+            return self._log is not None
+
+    def _reload(self) -> None:
+
+        self._clear()
+        self._load_from_file()
+        self._open_log()
+        self._replay_log()
+        self._list_tasks_json_cached.cache_clear()
+
+    def _clear(self) -> None:
+
+        self._ids = []
+        self._titles = []
+        self._priorities = bytearray()
+        self._is_done = bytearray()
+        self._index_by_id = {}
+        self._by_priority = [[] for _ in PRIORITY_NAMES]
+        self._by_done = {False: set(), True: set()}
+        self._next_task_id = 1
+        self._serialized = None
+        self._full_list_file = None
+        self._full_list_file_stale = True
+
+    def _full_list_json(self) -> bytearray:
+
+        if self._serialized is None:
+            self._serialized = bytearray(b"[]")
+            self._unfinished_offsets = {}
+            self._unpatched_completions = set()
+            for index in range(len(self._ids)):
+                self._serialize_task(index)
+        elif self._unpatched_completions:
+            self._patch_completions()
+        return self._serialized
+
+    def _patch_completions(self) -> None:
+
+        # Tasks completed since the last read still say "false" here. Splice
+        # "true" over all of them in one copy of the buffer; every splice is a
+        # byte shorter, so the offsets of later open tasks move down by one.
+        patched = bytearray()
+        offsets = {}
+        start = shift = 0
+        with memoryview(self._serialized) as view:
+            for index, offset in self._unfinished_offsets.items():
+                if index in self._unpatched_completions:
+                    patched += view[start:offset]
+                    patched += b"true"
+                    start = offset + 5
+                    shift += 1
+                else:
+                    offsets[index] = offset - shift
+            patched += view[start:]
+        self._serialized = patched
+        self._unfinished_offsets = offsets
+        self._unpatched_completions = set()
+
+    def _serialize_task(self, index: int) -> None:
+
+        # The full listing is kept encoded and patched rather than rebuilt.
+        # For tasks still open, remember where their isDone "false" literal
+        # sits so completing them needs no re-encode.
+        record = _json_dumps(self._task_at(index))
+        del self._serialized[-1]
+        if index:
+            self._serialized += b","
+        if not self._is_done[index]:
+            self._unfinished_offsets[index] = len(self._serialized) + record.rfind(b"false")
+        self._serialized += record
+        self._serialized += b"]"
+
+    def _task_at(self, index: int) -> Task:
+
+        return Task(
+            title=self._titles[index],
+            priority=PRIORITY_NAMES[self._priorities[index]],
+            isDone=bool(self._is_done[index]),
+            id=self._ids[index],
+        )
+
+    def _append_task(self, task: Task) -> None:
+
+        index = len(self._ids)
+        self._ids.append(task.id)
+        self._titles.append(task.title)
+        priority_id = PRIORITY_IDS[task.priority]
+        self._priorities.append(priority_id)
+        self._is_done.append(task.isDone)
+        self._index_by_id[task.id] = index
+        self._by_priority[priority_id].append(index)
+        self._by_done[task.isDone].add(index)
+        self._next_task_id = max(self._next_task_id, task.id + 1)
+        if self._serialized is not None:
+            self._serialize_task(index)
+
+    def _insert_task(self, task: Task) -> None:
+
+        tasks = [self._task_at(i) for i in range(len(self._ids))]
+        tasks.append(task)
+        tasks.sort(key=attrgetter("id"))
+        self._clear()
+        for t in tasks:
+            self._append_task(t)
+
+    async def _compact_if_needed(self) -> None:
+
+        threshold = max(LOG_COMPACTION_RATIO * self._snapshot_size, LOG_COMPACTION_MIN_BYTES)
+        if self._log_size <= max(threshold, self._compaction_retry_size):
+            return
+
+        # The writes themselves already succeeded, so a failed compaction is
+        # only logged. Retrying on every commit would rewrite the snapshot each
+        # time; wait until the log has doubled instead.
+        try:
+            await self.compact()
+        except Exception as e:
+            log(f"Log compaction failed: {e!r}")
+            self._compaction_retry_size = 2 * self._log_size
+
+    def _open_log(self, *, create: bool = False) -> None:
+
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._log_ino = 0
+        self._log_size = 0
+        self._compaction_retry_size = 0
+        if create or os.path.exists(self._log_filename):
+            self._log = open(self._log_filename, "a+b")
+            self._log_ino = os.fstat(self._log.fileno()).st_ino
+
+    async def _submit(self, entry: dict[str, Any]) -> Any:
+
+        # The queue and the writer task belong to the running loop, so they are
+        # created on first use (and again if a previous loop has gone away).
+        if self._writer_task is None or self._writer_task.done():
+            self._commit_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._run_writer())
+        future = asyncio.get_running_loop().create_future()
+        self._commit_queue.put_nowait((entry, future))
+        return await future
+
+    async def _run_writer(self) -> None:
+
+        # Requests that arrive while a batch is being written queue up behind it
+        # and go out together in the next one, sharing a single write and fsync.
+        while True:
+            batch = [await self._commit_queue.get()]
+            while len(batch) < GROUP_COMMIT_MAX_RECORDS and not self._commit_queue.empty():
+                batch.append(self._commit_queue.get_nowait())
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _commit(self, batch: list[tuple[dict[str, Any], asyncio.Future]]) -> None:
+
+        async with self._write_lock():
+            entries = []
+            completing = set()
+            next_task_id = self._next_task_id
+            for entry, _ in batch:
+                if entry["op"] == "create":
+                    entry["id"] = next_task_id
+                    next_task_id += 1
+                    entries.append(entry)
+                else:
+                    index = self._index_by_id.get(entry["id"])
+                    if index is not None and not self._is_done[index] and entry["id"] not in completing:
+                        completing.add(entry["id"])
+                        entries.append(entry)
+
+            if entries:
+                records = [_json_dumps(entry) + b"\n" for entry in entries]
+                await asyncio.get_running_loop().run_in_executor(None, self._write_log_records, records)
+                self._log_size += sum(map(len, records))
+                for entry in entries:
+                    self._apply_log_entry(entry)
+
+            for entry, future in batch:
+                if future.done():
+                    continue
+                if entry["op"] == "create":
+                    future.set_result(self._task_at(self._index_by_id[entry["id"]]))
+                else:
+                    future.set_result(entry["id"] in self._index_by_id)
+
+        await self._compact_if_needed()
+
+    def _write_log_records(self, records: list[bytes]) -> None:
+
+        fd = self._log.fileno()
+        if hasattr(os, "writev"):
+            written = os.writev(fd, records)
+            if written < sum(map(len, records)):
+                data = b"".join(records)[written:]
+                while data:
+                    data = data[os.write(fd, data):]
+        else:
+            self._log.write(b"".join(records))
+            self._log.flush()
+        if self._durable:
+            os.fsync(fd)
+
+    def _apply_log_entry(self, entry: Any) -> None:
+
+        if not isinstance(entry, dict):
+            return
+
+        op = entry.get("op")
+        if op == "create":
+            task = _task_from_json(entry)
+            if task is None or task.id in self._index_by_id:
+                return
+            if self._ids and task.id < self._ids[-1]:
+                self._insert_task(task)
+            else:
+                self._append_task(task)
+        elif op == "complete":
+            task_id = entry.get("id")
+            index = self._index_by_id.get(task_id) if isinstance(task_id, int) else None
+            if index is None or self._is_done[index]:
+                return
+            self._is_done[index] = True
+            self._by_done[False].discard(index)
+            self._by_done[True].add(index)
+            if self._serialized is not None:
+                self._unpatched_completions.add(index)
+        else:
+            return
+
+        self._full_list_file = None
+        self._full_list_file_stale = True
+        self._list_tasks_json_cached.cache_clear()
 
     def _load_from_file(self) -> None:
        
+        self._snapshot_size = 0
         if not os.path.exists(self._filename):
             return
 
-        with open(self._filename, "r", encoding="utf-8") as f:
-            contents = f.read().strip()
-            if not contents:
+        with open(self._filename, "rb") as f:
+            self._snapshot_size = os.fstat(f.fileno()).st_size
+            if not self._snapshot_size:
                 return
 
-        try:
-            parsed = json.loads(contents)
-        except json.JSONDecodeError:
-            return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as contents:
+                try:
+                    parsed = _json_loads(contents)
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    return
 
         if not isinstance(parsed, list):
             return
 
         loaded: dict[int, Task] = {}
-        max_id = 0
 
         for item in parsed:
-            if not isinstance(item, dict):
+            task = _task_from_json(item)
+            if task is not None:
+                loaded[task.id] = task
+
+        for task_id in sorted(loaded):
+            self._append_task(loaded[task_id])
+
+    def _replay_log(self) -> None:
+
+        if self._log is None:
+            return
+        self._log.seek(self._log_size)
+        contents = self._log.read()
+
+        # Only whole lines are applied; a record another worker is still
+        # writing is picked up on the next pass.
+        complete_size = contents.rfind(b"\n") + 1
+        for line in contents[:complete_size].splitlines():
+            try:
+                entry = _json_loads(line)
+            except (UnicodeDecodeError, json.JSONDecodeError):
                 continue
+            self._apply_log_entry(entry)
+
+        self._log_size += complete_size
+
+    def _drop_torn_record(self) -> None:
+
+        # Writers append whole records under the exclusive lock, so anything
+        # past the last complete record was left by a crash mid-append.
+        if self._log is not None and os.fstat(self._log.fileno()).st_size > self._log_size:
+            self._log.truncate(self._log_size)
+
+    def _write_file(self, filename: str, data: bytes) -> None:
+
+        with open(filename, "wb") as f:
+            f.write(data)
+            if self._durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+storage = TaskStorage(TASKS_FILENAME, TASKS_LOG_FILENAME)
+
+
+class ChunkedWriter:
+
+    def __init__(self, writer: asyncio.StreamWriter):
+
+        self._writer = writer
+
+    def write(self, data: bytes) -> None:
+
+        if data:
+            self._writer.writelines((b"%x\r\n" % len(data), data, b"\r\n"))
+
+    def close(self) -> None:
+
+        self._writer.write(b"0\r\n\r\n")
+
+
+class TaskApiHandler:
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        self._reader = reader
+        self._writer = writer
+        self.client_address = writer.get_extra_info("peername") or ("-",)
+        self.requestline = ""
+        self.command = ""
+        self.path = ""
+        self.request_version = ""
+        self.headers: dict[str, str] = {}
+        self._body_consumed = False
+        self._close_connection = False
+
+    async def handle(self) -> None:
+
+        try:
+            while not self._close_connection:
+                if await self._read_request_head():
+                    await self._dispatch()
+                    if not self._body_consumed and not self._close_connection:
+                        await self._discard_request_body()
+                await self._writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writer.close()
+
+    async def _dispatch(self) -> None:
+
+        path, query_string = _split_target(self.path)
+
+        route = self._ROUTES.get((self.command, path))
+        if route is not None:
+            await route(self, query_string)
+        elif self.command == "POST" and (task_id := _parse_complete_path(path)) is not None:
+            await self._complete_task(task_id)
+        elif self.command in ("GET", "POST"):
+            self._send_empty(404)
+        else:
+            self._send_empty(501)
+
+    def log_request(self, status_code: int) -> None:
+
+        log(f'{self.client_address[0]} "{self.requestline}" {status_code}')
+
+    async def _read_request_head(self) -> bool:
+
+        self.requestline = ""
+        self.headers = {}
+        self._body_consumed = False
+        self._close_connection = True
 
-            title = item.get("title")
-            priority = item.get("priority")
-            is_done = item.get("isDone")
-            task_id = item.get("id")
+        try:
+            head = await asyncio.wait_for(self._read_head_lines(), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return False
+        except asyncio.LimitOverrunError:
+            self._send_empty(431)
+            return False
+
+        lines = [line.rstrip(b"\r\n").decode("latin-1") for line in head]
+        self.requestline = lines[0]
+        parts = self.requestline.split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            self._send_empty(400)
+            return False
+        self.command, self.path, self.request_version = parts
+
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if not sep:
+                self._send_empty(400)
+                return False
+            self.headers[name.strip().lower()] = value.strip()
+
+        connection = self.headers.get("connection", "").lower()
+        if self.request_version == "HTTP/1.0":
+            self._close_connection = connection != "keep-alive"
+        else:
+            self._close_connection = connection == "close"
+        return True
+
+    async def _read_head_lines(self) -> list[bytes]:
+
+        # Lines may end in a bare LF, as http.server accepts; blank lines
+        # before the request line are skipped.
+        lines = []
+        size = 0
+        while True:
+            line = await self._reader.readuntil(b"\n")
+            size += len(line)
+            if size > MAX_REQUEST_HEAD_SIZE:
+                raise asyncio.LimitOverrunError("request head is too long", size)
+            if line != b"\r\n" and line != b"\n":
+                lines.append(line)
+            elif lines:
+                return lines
+
+    async def _discard_request_body(self) -> None:
 
-            if (
-                isinstance(title, str)
-                and isinstance(priority, str)
-                and priority in ALLOWED_PRIORITIES
-                and isinstance(is_done, bool)
-                and isinstance(task_id, int)
-                and task_id > 0
-            ):
-                loaded[task_id] = Task(title=title, priority=priority, isDone=is_done, id=task_id)
-                max_id = max(max_id, task_id)
+        try:
+            await self._read_request_body()
+        except (ValueError, asyncio.LimitOverrunError):
+            self._close_connection = True
+
+    def _send_response(self, status_code: int, headers: bytes, body: bytes = b"") -> None:
+
+        self.log_request(status_code)
+        self._writer.write(b"".join((
+            _STATUS_LINES[status_code],
+            _get_date_header(),
+            _CONNECTION_HEADERS[self._close_connection],
+            headers,
+            b"\r\n",
+            body,
+        )))
+
+    def _send_json(self, status_code: int, payload: Any, extra_headers: bytes = b"") -> None:
+
+        self._send_json_bytes(status_code, _json_dumps(payload), extra_headers)
 
-        self._tasks_by_id = loaded
-        self._next_task_id = max_id + 1
+    def _send_json_bytes(self, status_code: int, body: bytes, extra_headers: bytes = b"") -> None:
 
-    def _save_to_file_atomic(self) -> None:
-        
-        data = [asdict(t) for t in self.list_tasks()]
-        tmp_name = f"{self._filename}.tmp"
+        self._send_response(status_code, _JSON_HEADERS % len(body) + extra_headers, body)
 
-        with open(tmp_name, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False)
+    async def _send_json_file(self, status_code: int, file: BinaryIO) -> None:
 
-        os.replace(tmp_name, self._filename)
+        size = os.fstat(file.fileno()).st_size
+        self._send_response(status_code, _JSON_HEADERS % size)
+        try:
+            await asyncio.get_running_loop().sendfile(self._writer.transport, file, 0, size, fallback=False)
+        except asyncio.SendfileNotAvailableError:
+            self._writer.write(os.pread(file.fileno(), size, 0))
 
+    async def _send_json_stream(self, status_code: int, batches: Iterable[list[Task]]) -> None:
 
-storage = TaskStorage(TASKS_FILENAME)
+        self._send_response(status_code, _JSON_STREAM_HEADERS)
+        chunked = ChunkedWriter(self._writer)
+        chunked.write(b"[")
+        separator = b""
+        for batch in batches:
+            if batch:
+                chunked.write(separator + b",".join(map(_json_dumps, batch)))
+                separator = b","
+                await self._writer.drain()
+        chunked.write(b"]")
+        chunked.close()
 
+    def _send_empty(self, status_code: int) -> None:
 
-class TaskApiHandler(BaseHTTPRequestHandler):
+        self._send_response(status_code, _EMPTY_HEADERS)
 
-    def log_message(self, format: str, *args) -> None:
+    async def _read_request_body(self) -> bytes:
 
-        log(f'{self.client_address[0]} "{self.requestline}" {args[1]}')
+        self._body_consumed = True
+        if "chunked" in self.headers.get("transfer-encoding", "").lower():
+            return await self._read_chunked_body()
 
-    def _send_json(self, status_code: int, payload: Any, extra_headers: Optional[dict[str, str]] = None) -> None:
+        content_length = int(self.headers.get("content-length", "0") or "0")
+        return await self._reader.readexactly(content_length) if content_length > 0 else b""
 
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status_code)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(body)))
-        if extra_headers:
-            for k, v in extra_headers.items():
-                self.send_header(k, v)
-        self.end_headers()
-        self.wfile.write(body)
+    async def _read_chunked_body(self) -> bytearray:
 
-    def _send_empty(self, status_code: int, extra_headers: Optional[dict[str, str]] = None) -> None:
+        body = bytearray()
+        while True:
+            size_line = await self._reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                break
+            body += await self._reader.readexactly(size)
+            if await self._reader.readexactly(2) != b"\r\n":
+                raise ValueError("chunk is longer than its declared size")
 
-        self.send_response(status_code)
-        self.send_header("Content-Length", "0")
-        if extra_headers:
-            for k, v in extra_headers.items():
-                self.send_header(k, v)
-        self.end_headers()
+        while await self._reader.readuntil(b"\r\n") != b"\r\n":
+            pass
+        return body
 
-    def _read_request_json(self) -> Optional[Any]:
+    async def _read_request_json(self) -> Optional[Any]:
 
-        content_length = int(self.headers.get("Content-Length", "0") or "0")
-        body = self.rfile.read(content_length) if content_length > 0 else b""
+        try:
+            body = await self._read_request_body()
+        except (ValueError, asyncio.LimitOverrunError):
+            # The body framing is broken, so the next request cannot be found.
+            self._close_connection = True
+            return None
         if not body:
             return None
         try:
-            return json.loads(body.decode("utf-8"))
+            return _json_loads(body)
         except (UnicodeDecodeError, json.JSONDecodeError):
             return None
 
     def _require_json_content_type(self) -> bool:
 
-        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        content_type = (self.headers.get("content-type") or "").split(";")[0].strip().lower()
         return content_type == "application/json"
 
-    def _parse_non_negative_int(self, query: dict[str, list[str]], name: str) -> Optional[int]:
+    def _parse_non_negative_int(self, query: dict[str, str], name: str) -> Optional[int]:
 
-        if name not in query or not query[name]:
+        value_str = query.get(name)
+        if value_str is None:
             return None
-        value_str = query[name][0].strip()
-        if not value_str.isdigit():
+        # int() alone would also take signs and "_" digit separators.
+        value_str = value_str.strip()
+        if not value_str.isdecimal():
             return -1
         return int(value_str)
 
-    def do_GET(self) -> None:
-
-        parsed_url = urlparse(self.path)
-
-        if parsed_url.path != "/tasks":
-            self._send_empty(404)
-            return
+    async def _list_tasks(self, query_string: str) -> None:
 
-        query = parse_qs(parsed_url.query)
+        query = _parse_query(query_string)
 
         is_done: Optional[bool] = None
-        if "isDone" in query and query["isDone"]:
-            value = query["isDone"][0].strip().lower()
+        value = query.get("isDone")
+        if value is not None:
+            value = value.strip().lower()
             if value in {"true", "false"}:
                 is_done = (value == "true")
             else:
@@ -195,9 +1010,10 @@ class TaskApiHandler(BaseHTTPRequestHandler):
                 return
 
         priority: Optional[str] = None
-        if "priority" in query and query["priority"]:
-            value = query["priority"][0].strip()
-            if value in ALLOWED_PRIORITIES:
+        value = query.get("priority")
+        if value is not None:
+            value = value.strip()
+            if value in PRIORITY_IDS:
                 priority = value
             else:
                 self._send_json(400, {"error": "Query 'priority' must be one of: low, normal, high"})
@@ -213,68 +1029,111 @@ class TaskApiHandler(BaseHTTPRequestHandler):
             self._send_json(400, {"error": "Query 'offset' must be a non-negative integer"})
             return
 
-        tasks = storage.list_tasks(is_done=is_done, priority=priority)
+        await storage.refresh()
+        if is_done is None and priority is None and not offset and limit is None:
+            body_file = storage.full_list_file()
+            if body_file is not None:
+                await self._send_json_file(200, body_file)
+                return
 
-        start = offset or 0
-        if start > len(tasks):
-            tasks_page = []
+        body = storage.list_tasks_json(is_done=is_done, priority=priority, offset=offset or 0, limit=limit)
+        if body is None:
+            if self.request_version == "HTTP/1.0":
+                # Chunked framing does not exist in HTTP/1.0.
+                tasks = storage.list_tasks(is_done=is_done, priority=priority, offset=offset or 0, limit=limit)
+                self._send_json(200, tasks)
+            else:
+                batches = storage.iter_task_batches(is_done=is_done, priority=priority, offset=offset or 0, limit=limit)
+                await self._send_json_stream(200, batches)
         else:
-            tasks_page = tasks[start:]
+            self._send_json_bytes(200, body)
 
-        if limit is not None:
-            tasks_page = tasks_page[:limit]
+    async def _create_task(self, query_string: str) -> None:
 
-        tasks_json = [asdict(t) for t in tasks_page]
-        self._send_json(200, tasks_json)
+        if not self._require_json_content_type():
+            self._send_json(415, {"error": "Content-Type must be application/json"})
+            return
 
-    def do_POST(self) -> None:
+        request_json = await self._read_request_json()
+        if not isinstance(request_json, dict):
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
 
-        parsed_url = urlparse(self.path)
+        title = request_json.get("title")
+        priority = request_json.get("priority")
 
-        if parsed_url.path == "/tasks":
-            if not self._require_json_content_type():
-                self._send_json(415, {"error": "Content-Type must be application/json"})
-                return
+        if not isinstance(title, str) or not title.strip():
+            self._send_json(400, {"error": "Field 'title' must be a non-empty string"})
+            return
 
-            request_json = self._read_request_json()
-            if not isinstance(request_json, dict):
-                self._send_json(400, {"error": "Invalid JSON"})
-                return
+        if not isinstance(priority, str) or priority not in PRIORITY_IDS:
+            self._send_json(400, {"error": "Field 'priority' must be one of: low, normal, high"})
+            return
 
-            title = request_json.get("title")
-            priority = request_json.get("priority")
+        created = await storage.create_task(title.strip(), priority)
+        self._send_json(201, created, extra_headers=b"Location: /tasks/%d\r\n" % created.id)
 
-            if not isinstance(title, str) or not title.strip():
-                self._send_json(400, {"error": "Field 'title' must be a non-empty string"})
-                return
+    async def _complete_task(self, task_id: int) -> None:
 
-            if not isinstance(priority, str) or priority not in ALLOWED_PRIORITIES:
-                self._send_json(400, {"error": "Field 'priority' must be one of: low, normal, high"})
-                return
+        ok = await storage.mark_task_completed(task_id)
+        self._send_empty(200 if ok else 404)
 
-            created = storage.create_task(title.strip(), priority)
-            self._send_json(201, asdict(created), extra_headers={"Location": f"/tasks/{created.id}"})
-            return
+    _ROUTES = {
+        ("GET", "/tasks"): _list_tasks,
+        ("POST", "/tasks"): _create_task,
+    }
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+
+    await TaskApiHandler(reader, writer).handle()
+
+
+async def _serve(host: str, port: int, workers: int, *, announce: bool) -> None:
+
+    server = await asyncio.start_server(_handle_connection, host, port, reuse_port=workers > 1 or None)
+    if announce:
+        log(f"Server started on http://localhost:{port} with {workers} worker(s)")
+    async with server:
+        await server.serve_forever()
 
-        complete_match = re.fullmatch(r"/tasks/(\d+)/complete", parsed_url.path)
-        if complete_match:
-            task_id = int(complete_match.group(1))
-            ok = storage.mark_task_completed(task_id)
-            self._send_empty(200 if ok else 404)
-            return
 
-        self._send_empty(404)
+def run_server(host: str = "", port: int = 8000, workers: int = 1) -> None:
 
+    if not hasattr(os, "fork") or fcntl is None:
+        # Extra workers need fork(), and flock() to keep their writes apart.
+        workers = 1
 
-def run_server(host: str = "", port: int = 8000) -> None:
+    # Only forked workers share the files; a single process skips the
+    # per-request check for their writes.
+    storage.shared = workers > 1
+    worker_pids: list[int] = []
+    primary = True
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            primary = False
+            worker_pids.clear()
+            storage.reopen()
+            break
+        worker_pids.append(pid)
+    else:
+        if worker_pids:
+            # Stop the workers on SIGTERM too, not only on Ctrl+C.
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
 
-    httpd = HTTPServer((host, port), TaskApiHandler)
-    log(f"Server started on http://localhost:{port}")
     try:
-        httpd.serve_forever()
+        asyncio.run(_serve(host, port, workers, announce=primary))
     except KeyboardInterrupt:
-        httpd.server_close()
+        pass
+    finally:
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            os.waitpid(pid, 0)
 
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    run_server(workers=os.cpu_count() or 1)
\ No newline at end of file
@@ -0,0 +1,660 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from typing import Iterator
+from unittest import mock
+
+import server
+
+
+@contextmanager
+def without_os_function(name: str) -> Iterator[None]:
+
+    saved = getattr(os, name)
+    delattr(os, name)
+    try:
+        yield
+    finally:
+        setattr(os, name, saved)
+
+
+class StorageTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.tasks_path = os.path.join(self._tmp_dir.name, "tasks.txt")
+        self.log_path = os.path.join(self._tmp_dir.name, "tasks.log")
+
+    def open_storage(self, *, shared: bool = False) -> server.TaskStorage:
+
+        storage = server.TaskStorage(self.tasks_path, self.log_path, shared=shared)
+        self.addCleanup(storage.close)
+        return storage
+
+    def read_log(self) -> list[dict]:
+
+        with open(self.log_path, "rb") as f:
+            return [json.loads(line) for line in f]
+
+
+class ApiTestCase(StorageTestCase):
+
+    async def asyncSetUp(self) -> None:
+
+        self.storage = self.open_storage()
+        for patcher in (mock.patch.object(server, "storage", self.storage), mock.patch.object(server, "log")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.server = await asyncio.start_server(self._handle_connection, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._writers: list[asyncio.StreamWriter] = []
+        self._handlers: set[asyncio.Task] = set()
+
+    async def asyncTearDown(self) -> None:
+
+        # Hang up first: since Python 3.12 wait_closed() also waits for open
+        # connections, which would otherwise idle until KEEP_ALIVE_TIMEOUT.
+        # Earlier versions do not wait at all, so wait for the handlers here
+        # rather than have the runner cancel them.
+        for writer in self._writers:
+            writer.close()
+        if self._handlers:
+            await asyncio.wait(self._handlers)
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+
+        self._handlers.add(asyncio.current_task())
+        await server._handle_connection(reader, writer)
+
+    async def connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self._writers.append(writer)
+        return reader, writer
+
+    async def read_response(self, reader: asyncio.StreamReader) -> tuple[int, dict[str, str], bytes]:
+
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+        lines = head[:-4].decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(await reader.readuntil(b"\r\n"), 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+        return status, headers, body
+
+    async def request(self, raw: bytes) -> tuple[int, dict[str, str], bytes]:
+
+        reader, writer = await self.connect()
+        writer.write(raw)
+        return await self.read_response(reader)
+
+    async def post_task(self, title: str, priority: str = "low", *, version: str = "HTTP/1.1") -> tuple[int, dict[str, str], bytes]:
+
+        body = json.dumps({"title": title, "priority": priority}).encode()
+        return await self.request(
+            b"POST /tasks %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+            % (version.encode(), len(body), body)
+        )
+
+    async def assert_closed(self, reader: asyncio.StreamReader) -> None:
+
+        self.assertEqual(await asyncio.wait_for(reader.read(), 5), b"")
+
+
+class RequestParsingTest(ApiTestCase):
+
+    async def test_create_and_list_tasks(self) -> None:
+
+        status, headers, body = await self.post_task("  write tests  ", "high")
+        self.assertEqual(status, 201)
+        self.assertEqual(headers["location"], "/tasks/1")
+        self.assertEqual(json.loads(body), {"title": "write tests", "priority": "high", "isDone": False, "id": 1})
+
+        status, headers, body = await self.request(b"GET /tasks HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-type"], "application/json; charset=utf-8")
+        self.assertEqual(json.loads(body), [{"title": "write tests", "priority": "high", "isDone": False, "id": 1}])
+
+    async def test_complete_task(self) -> None:
+
+        await self.post_task("a")
+        status, _, _ = await self.request(b"POST /tasks/1/complete HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 200)
+        status, _, _ = await self.request(b"POST /tasks/2/complete HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 404)
+
+        _, _, body = await self.request(b"GET /tasks?isDone=true HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual([task["id"] for task in json.loads(body)], [1])
+
+    async def test_query_parameters(self) -> None:
+
+        for title, priority in (("a", "low"), ("b", "high"), ("c", "high"), ("d", "high")):
+            await self.post_task(title, priority)
+
+        _, _, body = await self.request(b"GET /tasks?priority=high&offset=1&limit=1 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual([task["title"] for task in json.loads(body)], ["c"])
+
+        huge = b"99999999999999999999"
+        for query, expected in (
+            (b"isDone=false&priority=high&offset=" + huge, []),
+            (b"isDone=true&priority=high&limit=" + huge, []),
+            (b"isDone=false&priority=high&offset=1&limit=" + huge, ["c", "d"]),
+            (b"offset=" + huge, []),
+        ):
+            status, _, body = await self.request(b"GET /tasks?%s HTTP/1.1\r\nConnection: close\r\n\r\n" % query)
+            self.assertEqual(status, 200)
+            self.assertEqual([task["title"] for task in json.loads(body)], expected)
+
+        for query, error in (
+            (b"isDone=maybe", "Query 'isDone' must be 'true' or 'false'"),
+            (b"priority=urgent", "Query 'priority' must be one of: low, normal, high"),
+            (b"limit=-1", "Query 'limit' must be a non-negative integer"),
+            (b"offset=x", "Query 'offset' must be a non-negative integer"),
+            (b"limit=1_0", "Query 'limit' must be a non-negative integer"),
+            (b"offset=%2B5", "Query 'offset' must be a non-negative integer"),
+            (b"offset=-0", "Query 'offset' must be a non-negative integer"),
+            (b"limit=%C2%B2", "Query 'limit' must be a non-negative integer"),
+        ):
+            status, _, body = await self.request(b"GET /tasks?%s HTTP/1.1\r\nConnection: close\r\n\r\n" % query)
+            self.assertEqual(status, 400)
+            self.assertEqual(json.loads(body), {"error": error})
+
+    async def test_invalid_task_payloads(self) -> None:
+
+        status, _, _ = await self.request(
+            b"POST /tasks HTTP/1.1\r\nContent-Type: text/plain\r\nContent-Length: 2\r\nConnection: close\r\n\r\n{}"
+        )
+        self.assertEqual(status, 415)
+
+        for body in (b"not json", b"[]", b'{"title": " ", "priority": "low"}', b'{"title": "a", "priority": "urgent"}'):
+            status, _, _ = await self.request(
+                b"POST /tasks HTTP/1.1\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+                % (len(body), body)
+            )
+            self.assertEqual(status, 400)
+
+    async def test_unknown_routes(self) -> None:
+
+        status, _, _ = await self.request(b"GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 404)
+        status, _, _ = await self.request(b"DELETE /tasks HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 501)
+
+    async def test_absolute_form_and_fragment_targets(self) -> None:
+
+        await self.post_task("a")
+        await self.post_task("b")
+        for target in (b"http://localhost/tasks?limit=1", b"/tasks?limit=1#top", b"//localhost/tasks?limit=1"):
+            status, _, body = await self.request(b"GET %s HTTP/1.1\r\nConnection: close\r\n\r\n" % target)
+            self.assertEqual(status, 200)
+            self.assertEqual([task["title"] for task in json.loads(body)], ["a"])
+
+        status, _, _ = await self.request(b"POST http://localhost/tasks/2/complete#x HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 200)
+
+    async def test_malformed_request_line(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"BOGUS\r\n\r\n")
+        status, headers, _ = await self.read_response(reader)
+        self.assertEqual(status, 400)
+        self.assertEqual(headers["connection"], "close")
+        await self.assert_closed(reader)
+
+    async def test_malformed_header_line(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks HTTP/1.1\r\nno colon here\r\n\r\n")
+        status, _, _ = await self.read_response(reader)
+        self.assertEqual(status, 400)
+        await self.assert_closed(reader)
+
+    async def test_bare_lf_line_endings(self) -> None:
+
+        await self.post_task("a")
+        status, _, body = await self.request(b"\nGET /tasks?limit=1 HTTP/1.1\nConnection: close\n\n")
+        self.assertEqual(status, 200)
+        self.assertEqual([task["title"] for task in json.loads(body)], ["a"])
+
+    async def test_oversized_request_head(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks HTTP/1.1\r\n" + b"X-Filler: %s\r\n" % (b"x" * 1000) * 100)
+        status, _, _ = await self.read_response(reader)
+        self.assertEqual(status, 431)
+        await self.assert_closed(reader)
+
+
+class WriteAheadLogTest(StorageTestCase):
+
+    async def test_log_is_replayed_on_open(self) -> None:
+
+        storage = self.open_storage()
+        await storage.create_task("a", "low")
+        await storage.create_task("b", "high")
+        self.assertTrue(await storage.mark_task_completed(1))
+        self.assertFalse(os.path.exists(self.tasks_path))
+        self.assertEqual([entry["op"] for entry in self.read_log()], ["create", "create", "complete"])
+
+        reopened = self.open_storage()
+        self.assertEqual(reopened.list_tasks(), storage.list_tasks())
+        self.assertEqual(reopened.list_tasks(is_done=True), [server.Task("a", "low", True, 1)])
+        self.assertEqual((await reopened.create_task("c", "normal")).id, 3)
+
+    async def test_files_are_created_by_the_first_write(self) -> None:
+
+        with open(self.tasks_path, "w") as f:
+            f.write('[{"title": "a", "priority": "low", "isDone": false, "id": 1}]')
+
+        storage = self.open_storage()
+        self.assertEqual([task.title for task in storage.list_tasks()], ["a"])
+        self.assertEqual(os.listdir(self._tmp_dir.name), ["tasks.txt"])
+
+        await storage.create_task("b", "low")
+        self.assertEqual(sorted(os.listdir(self._tmp_dir.name)), ["tasks.log", "tasks.log.lock", "tasks.txt"])
+        storage.close()
+        self.assertEqual([task.title for task in self.open_storage().list_tasks()], ["a", "b"])
+
+    async def test_torn_record_is_dropped(self) -> None:
+
+        storage = self.open_storage()
+        await storage.create_task("a", "low")
+        with open(self.log_path, "ab") as f:
+            f.write(b'{"op":"create","title":"b"')
+
+        reopened = self.open_storage()
+        self.assertEqual([task.title for task in reopened.list_tasks()], ["a"])
+        await reopened.create_task("c", "low")
+        self.assertEqual([task.title for task in self.open_storage().list_tasks()], ["a", "c"])
+
+    async def test_compaction_moves_log_into_snapshot(self) -> None:
+
+        storage = self.open_storage()
+        for title in ("a", "b", "c"):
+            await storage.create_task(title, "normal")
+        await storage.mark_task_completed(2)
+        await storage.compact()
+
+        self.assertEqual(os.path.getsize(self.log_path), 0)
+        with open(self.tasks_path, "rb") as f:
+            self.assertEqual(json.loads(f.read()), [server._task_to_dict(task) for task in storage.list_tasks()])
+
+        reopened = self.open_storage()
+        self.assertEqual(reopened.list_tasks(), storage.list_tasks())
+        self.assertEqual((await reopened.create_task("d", "low")).id, 4)
+        self.assertEqual(len(self.open_storage().list_tasks()), 4)
+
+    async def test_log_is_compacted_when_it_grows(self) -> None:
+
+        storage = self.open_storage()
+        with mock.patch.object(server, "LOG_COMPACTION_MIN_BYTES", 1024):
+            for i in range(100):
+                await storage.create_task(f"task {i}", "low")
+
+        with open(self.tasks_path, "rb") as f:
+            snapshot = json.loads(f.read())
+        self.assertEqual(len(snapshot) + len(self.read_log()), 100)
+        self.assertGreater(len(snapshot), len(self.read_log()))
+        self.assertEqual(len(self.open_storage().list_tasks()), 100)
+
+    async def test_failed_compaction_backs_off(self) -> None:
+
+        storage = self.open_storage()
+        write_file = storage._write_file
+
+        def write_file_then_fail(filename: str, data: bytes) -> None:
+
+            write_file(filename, data)
+            raise OSError("disk full")
+
+        with mock.patch.object(server, "LOG_COMPACTION_MIN_BYTES", 1024), mock.patch.object(server, "log") as log:
+            with mock.patch.object(storage, "_write_file", side_effect=write_file_then_fail) as write:
+                for i in range(200):
+                    await storage.create_task(f"task {i}", "low")
+
+        self.assertLessEqual(write.call_count, 6)
+        self.assertEqual(log.call_count, write.call_count)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.log_path))), ["tasks.log", "tasks.log.lock"])
+        self.assertEqual(len(self.read_log()), 200)
+
+        await storage.compact()
+        self.assertEqual(self.read_log(), [])
+
+    async def test_invalid_snapshot_is_ignored(self) -> None:
+
+        for contents in (b"", b"{}", b"\xff\xfe", b"[1, {\"title\": \"x\"}]"):
+            with open(self.tasks_path, "wb") as f:
+                f.write(contents)
+            self.assertEqual(self.open_storage().list_tasks(), [])
+
+
+class SharedStorageTest(StorageTestCase):
+
+    async def test_other_writers_are_picked_up(self) -> None:
+
+        first = self.open_storage(shared=True)
+        second = self.open_storage(shared=True)
+        await first.create_task("a", "low")
+        created = await second.create_task("b", "low")
+        self.assertEqual(created.id, 2)
+        self.assertTrue(await first.mark_task_completed(2))
+        await second.refresh()
+        self.assertEqual(second.list_tasks(is_done=True), [server.Task("b", "low", True, 2)])
+
+    async def test_compaction_by_another_worker_is_picked_up(self) -> None:
+
+        storage = self.open_storage(shared=True)
+        other = self.open_storage(shared=True)
+        for title in ("a", "b", "c"):
+            await storage.create_task(title, "normal")
+        await storage.compact()
+
+        await other.refresh()
+        self.assertEqual(other.list_tasks(), storage.list_tasks())
+        self.assertEqual((await other.create_task("d", "low")).id, 4)
+        await storage.refresh()
+        self.assertEqual(len(storage.list_tasks()), 4)
+
+    async def test_unshared_storage_does_not_check_for_other_writers(self) -> None:
+
+        storage = self.open_storage()
+        await self.open_storage().create_task("a", "low")
+        with mock.patch.object(server.os, "stat") as stat, mock.patch.object(server.os, "fstat") as fstat:
+            await storage.refresh()
+        self.assertEqual((stat.call_count, fstat.call_count), (0, 0))
+        self.assertEqual(storage.list_tasks(), [])
+
+        storage.shared = True
+        await storage.refresh()
+        self.assertEqual([task.title for task in storage.list_tasks()], ["a"])
+
+    @unittest.skipIf(server.fcntl is None, "needs fcntl")
+    async def test_waiting_for_another_worker_does_not_block_the_loop(self) -> None:
+
+        storage = self.open_storage()
+        with open(f"{self.log_path}.lock", "ab") as other_worker:
+            server.fcntl.flock(other_worker.fileno(), server.fcntl.LOCK_EX)
+            create = asyncio.ensure_future(storage.create_task("a", "low"))
+            await asyncio.sleep(0.05)
+            self.assertFalse(create.done())
+            server.fcntl.flock(other_worker.fileno(), server.fcntl.LOCK_UN)
+        self.assertEqual((await asyncio.wait_for(create, 5)).id, 1)
+
+    async def test_compaction_keeps_records_logged_meanwhile(self) -> None:
+
+        storage = self.open_storage()
+        await storage.create_task("a", "low")
+        write_file = storage._write_file
+
+        def write_file_while_another_worker_appends(filename: str, data: bytes) -> None:
+
+            write_file(filename, data)
+            if filename.startswith(self.tasks_path):
+                with open(self.log_path, "ab") as f:
+                    f.write(b'{"op":"create","title":"b","priority":"high","isDone":false,"id":2}\n')
+
+        with mock.patch.object(storage, "_write_file", write_file_while_another_worker_appends), without_os_function("pread"):
+            await storage.compact()
+
+        self.assertEqual([entry["id"] for entry in self.read_log()], [2])
+        self.assertEqual([task.title for task in storage.list_tasks()], ["a", "b"])
+        self.assertEqual([task.title for task in self.open_storage().list_tasks()], ["a", "b"])
+
+
+class StreamingTest(ApiTestCase):
+
+    async def test_large_listing_is_streamed(self) -> None:
+
+        for i in range(server.STREAM_THRESHOLD + 1):
+            await self.storage.create_task(f"task {i}", "low")
+
+        status, headers, body = await self.request(b"GET /tasks?priority=low HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["transfer-encoding"], "chunked")
+        self.assertEqual(len(json.loads(body)), server.STREAM_THRESHOLD + 1)
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks?priority=low HTTP/1.0\r\n\r\n")
+        status, headers, body = await self.read_response(reader)
+        self.assertEqual(status, 200)
+        self.assertNotIn("transfer-encoding", headers)
+        self.assertEqual(len(json.loads(body)), server.STREAM_THRESHOLD + 1)
+        await self.assert_closed(reader)
+
+
+    async def test_streamed_listing_builds_each_task_once(self) -> None:
+
+        for i in range(2 * server.STREAM_THRESHOLD + 10):
+            await self.storage.create_task(f"task {i}", server.PRIORITY_NAMES[i % 2])
+
+        task_at = self.storage._task_at
+        built = []
+
+        def count_task_at(index: int) -> server.Task:
+
+            built.append(index)
+            return task_at(index)
+
+        for query, kwargs in (
+            (b"priority=normal", {"priority": "normal"}),
+            (b"isDone=false&offset=5&limit=1001", {"is_done": False, "offset": 5, "limit": 1001}),
+        ):
+            built.clear()
+            with mock.patch.object(self.storage, "_task_at", count_task_at):
+                status, headers, body = await self.request(b"GET /tasks?%s HTTP/1.1\r\nConnection: close\r\n\r\n" % query)
+            self.assertEqual((status, headers["transfer-encoding"]), (200, "chunked"))
+            expected = self.storage.list_tasks(**kwargs)
+            self.assertEqual(json.loads(body), [server._task_to_dict(task) for task in expected])
+            self.assertEqual(len(built), len(expected))
+
+    async def test_task_batches(self) -> None:
+
+        for i in range(10):
+            await self.storage.create_task(f"task {i}", "low")
+        await self.storage.mark_task_completed(3)
+
+        batches = list(self.storage.iter_task_batches(is_done=False, offset=1, batch_size=4))
+        self.assertEqual([[task.id for task in batch] for batch in batches], [[2, 4, 5, 6], [7, 8, 9, 10]])
+
+
+class ChunkedRequestBodyTest(ApiTestCase):
+
+    async def test_chunked_request_body(self) -> None:
+
+        body = b'{"title": "chunked", "priority": "normal"}'
+        status, _, response = await self.request(
+            b"POST /tasks HTTP/1.1\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n%x\r\n%s\r\n%x;ext=1\r\n%s\r\n0\r\n\r\n"
+            % (10, body[:10], len(body) - 10, body[10:])
+        )
+        self.assertEqual(status, 201)
+        self.assertEqual(json.loads(response)["title"], "chunked")
+
+    async def test_chunk_longer_than_declared_closes_connection(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(
+            b"POST /tasks HTTP/1.1\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"2\r\n{}xx\r\n0\r\n\r\n"
+        )
+        status, headers, _ = await self.read_response(reader)
+        self.assertEqual(status, 400)
+        self.assertEqual(headers["connection"], "close")
+        await self.assert_closed(reader)
+
+    async def test_invalid_chunk_size_closes_connection(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(
+            b"POST /tasks HTTP/1.1\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"zz\r\n{}\r\n0\r\n\r\n"
+        )
+        status, _, _ = await self.read_response(reader)
+        self.assertEqual(status, 400)
+        await self.assert_closed(reader)
+
+
+class EncodedListingTest(StorageTestCase):
+
+    async def test_full_listing_matches_fresh_encoding(self) -> None:
+
+        storage = self.open_storage()
+        for i in range(20):
+            await storage.create_task(f"task {i}", server.PRIORITY_NAMES[i % 3])
+        storage.list_tasks_json()
+
+        for batch in ((3, 4, 19), (1,), (), (2, 5, 6, 7, 20, 22)):
+            for task_id in batch:
+                await storage.mark_task_completed(task_id)
+            await storage.create_task(f"after {batch}", "high")
+            listing = storage.list_tasks_json()
+            tasks = storage.list_tasks()
+            self.assertEqual(json.loads(listing), [server._task_to_dict(task) for task in tasks])
+            for task in tasks:
+                self.assertIn(server._json_dumps(task), listing)
+
+
+class KeepAliveTest(ApiTestCase):
+
+    async def test_sequential_requests_share_connection(self) -> None:
+
+        reader, writer = await self.connect()
+        body = b'{"title": "a", "priority": "low"}'
+        writer.write(b"POST /tasks HTTP/1.1\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        status, headers, _ = await self.read_response(reader)
+        self.assertEqual((status, headers["connection"]), (201, "keep-alive"))
+
+        writer.write(b"GET /tasks HTTP/1.1\r\n\r\n")
+        status, _, response = await self.read_response(reader)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(response)), 1)
+
+    async def test_pipelined_requests(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks HTTP/1.1\r\n\r\nGET /nope HTTP/1.1\r\n\r\nGET /tasks HTTP/1.1\r\nConnection: close\r\n\r\n")
+        statuses = [(await self.read_response(reader))[0] for _ in range(3)]
+        self.assertEqual(statuses, [200, 404, 200])
+        await self.assert_closed(reader)
+
+    async def test_unread_body_is_discarded(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"POST /tasks/7/complete HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello")
+        writer.write(b"GET /tasks HTTP/1.1\r\n\r\n")
+        self.assertEqual((await self.read_response(reader))[0], 404)
+        self.assertEqual((await self.read_response(reader))[0], 200)
+
+    async def test_http10_closes_by_default(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks HTTP/1.0\r\n\r\n")
+        status, headers, _ = await self.read_response(reader)
+        self.assertEqual((status, headers["connection"]), (200, "close"))
+        await self.assert_closed(reader)
+
+    async def test_http10_keep_alive(self) -> None:
+
+        reader, writer = await self.connect()
+        writer.write(b"GET /tasks HTTP/1.0\r\nConnection: keep-alive\r\n\r\n")
+        status, headers, _ = await self.read_response(reader)
+        self.assertEqual((status, headers["connection"]), (200, "keep-alive"))
+        writer.write(b"GET /tasks HTTP/1.0\r\n\r\n")
+        self.assertEqual((await self.read_response(reader))[0], 200)
+        await self.assert_closed(reader)
+
+    async def test_idle_connection_times_out(self) -> None:
+
+        with mock.patch.object(server, "KEEP_ALIVE_TIMEOUT", 0.1):
+            reader, _ = await self.connect()
+            await self.assert_closed(reader)
+
+
+class GroupCommitTest(StorageTestCase):
+
+    async def test_concurrent_creates_get_distinct_ids(self) -> None:
+
+        storage = self.open_storage()
+        created = await asyncio.gather(*(storage.create_task(f"t{i}", "low") for i in range(50)))
+        self.assertEqual(sorted(task.id for task in created), list(range(1, 51)))
+        self.assertEqual(len(self.open_storage().list_tasks()), 50)
+
+    async def test_without_writev(self) -> None:
+
+        storage = self.open_storage()
+        with without_os_function("writev"):
+            created = await asyncio.gather(*(storage.create_task(f"t{i}", "low") for i in range(5)))
+            self.assertTrue(await storage.mark_task_completed(1))
+        self.assertEqual([task.id for task in created], [1, 2, 3, 4, 5])
+        self.assertEqual([entry["op"] for entry in self.read_log()], ["create"] * 5 + ["complete"])
+
+    async def test_repeated_completion_is_logged_once(self) -> None:
+
+        storage = self.open_storage()
+        await storage.create_task("a", "low")
+        results = await asyncio.gather(*(storage.mark_task_completed(1) for _ in range(3)))
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual([entry["op"] for entry in self.read_log()], ["create", "complete"])
+
+
+class FullListFileTest(ApiTestCase):
+
+    @unittest.skipUnless(hasattr(os, "memfd_create"), "needs memfd_create")
+    async def test_full_list_file(self) -> None:
+
+        storage = self.open_storage()
+        await storage.create_task("a", "low")
+        with mock.patch.object(storage, "_write_full_list_file", wraps=storage._write_full_list_file) as write:
+            self.assertIsNone(storage.full_list_file())
+            self.assertIsNone(storage.full_list_file())
+            self.assertEqual(write.call_count, 1)
+
+        with mock.patch.object(server, "SENDFILE_MIN_BYTES", 1):
+            await storage.create_task("b", "low")
+            first = storage.full_list_file()
+            self.assertIs(storage.full_list_file(), first)
+            await storage.mark_task_completed(1)
+            second = storage.full_list_file()
+
+        self.assertIsNot(second, first)
+        self.assertEqual(os.pread(second.fileno(), 1 << 16, 0), storage.list_tasks_json())
+        self.assertEqual(json.loads(os.pread(first.fileno(), 1 << 16, 0))[0]["isDone"], False)
+        first.close()
+
+    async def test_full_listing_is_sent_from_file(self) -> None:
+
+        for i in range(3):
+            await self.storage.create_task(f"task {i}", "low")
+
+        with mock.patch.object(server, "SENDFILE_MIN_BYTES", 1):
+            reader, writer = await self.connect()
+            for _ in range(2):
+                writer.write(b"GET /tasks HTTP/1.1\r\n\r\n")
+                status, headers, body = await self.read_response(reader)
+                self.assertEqual(status, 200)
+                self.assertNotIn("transfer-encoding", headers)
+                self.assertEqual(body, self.storage.list_tasks_json())
+
+
+if __name__ == "__main__":
+    unittest.main()